@@ -0,0 +1,18 @@
+# cython: language_level=3
+"""
+Compiled per-row helper for flatten_json.py.
+
+Build in place with: python setup_fast_rowtransform.py build_ext --inplace
+"""
+from decimal import Decimal
+
+
+cpdef list stringify_decimal_values(object values):
+    """Returns the values as a list, with Decimal values converted to strings."""
+    cdef list out = []
+    cdef object v
+    for v in values:
+        if type(v) is Decimal:
+            v = str(v)
+        out.append(v)
+    return out
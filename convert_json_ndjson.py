@@ -3,13 +3,28 @@
 
 import json
 import argparse
+import contextlib
+import functools
+import multiprocessing as mp
+import os
 import sys
 import logging
+import mmap
+import re
+from collections import deque
 from decimal import Decimal
 import ijson
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Large output buffer so multi-GB conversions issue far fewer write() syscalls than the 8 KiB default
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+
 class DecimalEncoder(json.JSONEncoder):
     """Custom JSON encoder to handle Decimal objects."""
     def default(self, o):
@@ -18,6 +33,57 @@ class DecimalEncoder(json.JSONEncoder):
             return str(o)
         return super(DecimalEncoder, self).default(o)
 
+def _decimal_default(o):
+    """orjson `default` hook to handle Decimal objects."""
+    if isinstance(o, Decimal):
+        # Convert Decimal to string to preserve precision
+        return str(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, cls=DecimalEncoder).encode('utf-8')
+
+def _stdlib_dumps_compact(obj):
+    """Stdlib fallback that matches orjson's output: no whitespace and raw UTF-8 rather than \\u escapes."""
+    try:
+        return json.dumps(obj, cls=DecimalEncoder, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    except UnicodeEncodeError:
+        # Lone surrogates (e.g. a parsed "\ud800") cannot be encoded as UTF-8; keep them escaped
+        return json.dumps(obj, cls=DecimalEncoder, separators=(',', ':')).encode('utf-8')
+
+# Prefer orjson for the per-object encode/decode; fall back to the stdlib json module.
+# _dumps and _transcode return UTF-8 encoded bytes.
+if orjson is not None:
+    # orjson versions before 3.9 silently parse integers outside the int64/uint64 range as floats,
+    # so lines containing long digit runs are always handed to the stdlib parser. 19 digits is
+    # the shortest such run: -9223372036854775809 is just below the int64 minimum.
+    _LONG_DIGIT_RUN = re.compile(rb'\d{19,}')
+
+    def _dumps(obj):
+        try:
+            return orjson.dumps(obj, default=_decimal_default)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the stdlib encoder writes exactly
+            return _stdlib_dumps_compact(obj)
+
+    def _transcode(line):
+        """Parses a single JSON document and re-serializes it, without losing precision."""
+        if _LONG_DIGIT_RUN.search(line) is None:
+            try:
+                return orjson.dumps(orjson.loads(line), default=_decimal_default)
+            except (orjson.JSONDecodeError, orjson.JSONEncodeError):
+                # orjson rejects NaN/Infinity, which the stdlib accepts; invalid JSON is
+                # re-raised by json.loads below
+                pass
+        # Serialize with the stdlib as well so NaN/Infinity and big integers round-trip
+        return _stdlib_dumps_compact(json.loads(line))
+else:
+    _dumps = _stdlib_dumps
+
+    def _transcode(line):
+        """Parses a single JSON document and re-serializes it."""
+        return _stdlib_dumps(json.loads(line))
+
 def setup_logging(log_level, log_file):
     """Configures logging to console and optionally to a file."""
     logger.setLevel(logging.DEBUG)
@@ -43,48 +109,52 @@ def setup_logging(log_level, log_file):
         file_handler.setFormatter(file_formatter)
         logger.addHandler(file_handler)
 
-def convert_ndjson_to_json(input_file_path, output_file_path, batch_size):
+def convert_ndjson_to_json(input_file_path, output_file_path, batch_size, workers, passthrough):
     """
     Reads a large NDJSON file, converting it to a single JSON array using streaming and batching.
+    With `workers` > 1, batches are parsed and serialized in parallel by that many processes.
+    With `passthrough`, lines are copied into the array as-is without being parsed or validated.
     """
+    if passthrough:
+        workers = 1
     logger.info(f"Starting NDJSON to JSON conversion...")
-    logger.debug(f"Input: {input_file_path}, Output: {output_file_path}, Batch Size: {batch_size}")
+    logger.debug(f"Input: {input_file_path}, Output: {output_file_path}, Batch Size: {batch_size}, "
+                 f"Workers: {workers}, Passthrough: {passthrough}")
     object_count = 0
 
     try:
-        with open(input_file_path, 'r', encoding='utf-8') as infile, \
-            open(output_file_path, 'w', encoding='utf-8') as outfile:
+        with open(input_file_path, 'rb') as infile, \
+            open(output_file_path, 'wb', buffering=WRITE_BUFFER_SIZE) as outfile, \
+            (mp.Pool(workers) if workers > 1 else contextlib.nullcontext()) as pool:
 
-            outfile.write('[\n')
+            outfile.write(b'[\n')
             is_first_object = True
-            batch = []
 
-            for line_num, line in enumerate(infile, 1):
-                if not line.strip():
-                    logger.debug(f"Skipping empty line at position {line_num}")
-                    continue
+            batches = read_batches(iter_mapped_lines(infile), batch_size)
+            if passthrough:
+                results = map(join_raw_batch, batches)
+            elif pool is None:
+                # Results are written before the next batch is serialized, so one buffer can be reused
+                results = map(functools.partial(serialize_batch, buffer=bytearray()), batches)
+            else:
+                results = imap_bounded(pool, serialize_batch, batches, max_pending=2 * workers)
 
-                try:
-                    # Use parse_float=Decimal to preserve precision if needed, but we will handle it on dump
-                    batch.append(json.loads(line))
+            for batch_bytes, batch_count, errors in results:
+                for line_num, error, line in errors:
+                    logger.error("Error decoding JSON on line %d: %s", line_num, error)
+                    logger.error("Problematic line: %s", line)
 
-                    if len(batch) >= batch_size:
-                        logger.debug(f"Writing batch of {len(batch)} objects to disk.")
-                        write_batch(outfile, batch, is_first_object)
-                        is_first_object = False
-                        object_count += len(batch)
-                        batch = []
-
-                except json.JSONDecodeError as e:
-                    logger.error(f"Error decoding JSON on line {line_num}: {e}")
-                    logger.error(f"Problematic line: {line.strip()}")
+                if not batch_count:
+                    continue
 
-            if batch:
-                logger.debug(f"Writing final batch of {len(batch)} objects.")
-                write_batch(outfile, batch, is_first_object)
-                object_count += len(batch)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Writing batch of %d objects to disk.", batch_count)
+                outfile.write(b'    ' if is_first_object else b',\n    ')
+                outfile.write(batch_bytes)
+                is_first_object = False
+                object_count += batch_count
 
-            outfile.write('\n]')
+            outfile.write(b'\n]')
 
     except FileNotFoundError:
         logger.error(f"Input file not found at '{input_file_path}'", exc_info=True)
@@ -95,14 +165,88 @@ def convert_ndjson_to_json(input_file_path, output_file_path, batch_size):
 
     logger.info(f"Conversion complete! Successfully processed {object_count} objects.")
 
-def write_batch(outfile, batch, is_first_object):
-    """Helper to write a batch of objects to the JSON array."""
-    if not batch:
+def iter_mapped_lines(infile):
+    """
+    Yields (line_num, line) pairs from a file opened in binary mode.
+    The file is memory-mapped and split on newlines, so lines are raw UTF-8 bytes with no text decoding.
+    """
+    if os.fstat(infile.fileno()).st_size == 0:
+        # mmap cannot map an empty file
         return
-    output_string = ',\n'.join(['    ' + json.dumps(obj, cls=DecimalEncoder) for obj in batch])
-    if not is_first_object:
-        outfile.write(',\n')
-    outfile.write(output_string)
+
+    with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        line_num = 0
+        while (end := mm.find(b'\n', start)) != -1:
+            line_num += 1
+            yield line_num, mm[start:end]
+            start = end + 1
+
+        if start < len(mm):
+            yield line_num + 1, mm[start:]
+
+def read_batches(numbered_lines, batch_size):
+    """Helper to group non-empty (line_num, line) pairs into batches."""
+    batch = []
+    for line_num, line in numbered_lines:
+        if not line.strip():
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Skipping empty line at position %d", line_num)
+            continue
+
+        batch.append((line_num, line))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+def serialize_batch(batch, buffer=None):
+    """
+    Worker that parses a batch of NDJSON lines and serializes it as JSON array elements.
+    Returns the comma-separated elements, the number of objects written and any decode errors,
+    so that the parent process does all the logging and writing.
+    In-process callers can pass a reusable `buffer`; its contents are only valid until the next call.
+    """
+    if buffer is None:
+        buffer = bytearray()
+    else:
+        buffer.clear()
+    count = 0
+    errors = []
+    for line_num, line in batch:
+        try:
+            serialized = _transcode(line)
+        except json.JSONDecodeError as e:
+            errors.append((line_num, str(e), line.strip().decode('utf-8', errors='replace')))
+            continue
+
+        if count:
+            buffer += b',\n    '
+        buffer += serialized
+        count += 1
+
+    # The bytearray is returned as-is; it pickles across processes and can be written directly
+    return buffer, count, errors
+
+def join_raw_batch(batch):
+    """Joins a batch of NDJSON lines as JSON array elements without parsing them, in the same shape as serialize_batch."""
+    return b',\n    '.join([line.strip() for _, line in batch]), len(batch), []
+
+def imap_bounded(pool, func, iterable, max_pending):
+    """
+    Ordered equivalent of pool.imap that keeps at most `max_pending` tasks in flight,
+    so the input file is not read ahead of the workers without bound.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+
+    while pending:
+        yield pending.popleft().get()
 
 def convert_json_to_ndjson(input_file_path, output_file_path, batch_size):
     """
@@ -114,25 +258,23 @@ def convert_json_to_ndjson(input_file_path, output_file_path, batch_size):
 
     try:
         with open(input_file_path, 'rb') as infile, \
-            open(output_file_path, 'w', encoding='utf-8') as outfile:
+            open(output_file_path, 'wb', buffering=WRITE_BUFFER_SIZE) as outfile:
 
             batch = []
             # Use `use_float=True` to avoid ijson creating Decimal objects
             for obj in ijson.items(infile, 'item', use_float=True):
                 batch.append(obj)
                 if len(batch) >= batch_size:
-                    logger.debug(f"Writing batch of {len(batch)} objects to disk.")
-                    for item in batch:
-                        json.dump(item, outfile, cls=DecimalEncoder)
-                        outfile.write('\n')
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Writing batch of %d objects to disk.", len(batch))
+                    write_ndjson_batch(outfile, batch)
                     object_count += len(batch)
                     batch = []
 
             if batch:
-                logger.debug(f"Writing final batch of {len(batch)} objects.")
-                for item in batch:
-                    json.dump(item, outfile, cls=DecimalEncoder)
-                    outfile.write('\n')
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Writing final batch of %d objects.", len(batch))
+                write_ndjson_batch(outfile, batch)
                 object_count += len(batch)
 
     except ijson.JSONError as e:
@@ -147,6 +289,14 @@ def convert_json_to_ndjson(input_file_path, output_file_path, batch_size):
 
     logger.info(f"Conversion complete! Successfully processed {object_count} objects.")
 
+def write_ndjson_batch(outfile, batch):
+    """Helper to write a batch of objects as NDJSON lines with a single write call."""
+    parts = []
+    for item in batch:
+        parts.append(_dumps(item))
+        parts.append(b'\n')
+    outfile.write(b''.join(parts))
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description="Convert between JSON and NDJSON formats using a streaming, batch-oriented approach.",
@@ -171,6 +321,19 @@ if __name__ == '__main__':
         default=1000,
         help="Number of objects to process in each batch (default: 1000)."
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help="Number of worker processes used for ndjson-to-json (default: 1, i.e. no worker pool).\n"
+             "With orjson installed, process overhead usually outweighs the parsing gain."
+    )
+    parser.add_argument(
+        '--passthrough',
+        action='store_true',
+        help="For ndjson-to-json, copy each line into the output array as-is instead of parsing and\n"
+             "re-serializing it. Faster, but lines are not validated."
+    )
     parser.add_argument(
         '--log-level',
         default='INFO',
@@ -191,4 +354,4 @@ if __name__ == '__main__':
     if args.conversion_type == 'json-to-ndjson':
         convert_json_to_ndjson(args.input_file, args.output_file, args.batch_size)
     elif args.conversion_type == 'ndjson-to-json':
-        convert_ndjson_to_json(args.input_file, args.output_file, args.batch_size)
\ No newline at end of file
+        convert_ndjson_to_json(args.input_file, args.output_file, args.batch_size, args.workers, args.passthrough)
\ No newline at end of file
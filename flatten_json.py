@@ -3,11 +3,44 @@ import ijson
 import csv
 import json
 import logging
+import os
 from pathlib import Path
 from decimal import Decimal
+from operator import itemgetter
 import duckdb
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.json as pa_json
 from fastavro import writer, parse_schema
 
+# Compiled row helper (see _fast_rowtransform.pyx); a pure-Python equivalent is used when not built
+try:
+    from _fast_rowtransform import stringify_decimal_values
+except ImportError:
+    def stringify_decimal_values(values):
+        return [str(v) if v.__class__ is Decimal else v for v in values]
+
+# Optional faster NDJSON decoder
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Optional fast path for JSON arrays that fit in memory
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# Used to check whether a file can be parsed in memory in one go
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Large output buffer so multi-GB outputs issue far fewer write() syscalls than the 8 KiB default
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+
 def setup_logging():
     """Set up logging to file and console."""
     log_file = Path(__file__).parent / 'data_processing.log'
@@ -27,31 +60,49 @@ class DecimalEncoder(json.JSONEncoder):
             return str(obj)
         return super(DecimalEncoder, self).default(obj)
 
-# Custom object hook for JSON decoding to convert numbers to Decimal
-def decimal_object_hook(obj):
-    for key, value in obj.items():
-        if isinstance(value, float):
-            obj[key] = Decimal(str(value))
-    return obj
-
-def flatten_json_stream(json_file_path, csv_file_path):
+def flatten_json_stream(json_file_path, csv_file_path, schema_cls=None, use_simdjson=False, use_pyarrow=False):
     """
     Flattens a large JSON or NDJSON file to a CSV file using a streaming approach.
+    If `schema_cls` (a msgspec.Struct subclass) is given, NDJSON records are decoded with a typed msgspec decoder.
+    With `use_simdjson`, JSON arrays that fit in memory are parsed in one pass with simdjson. This is faster,
+    but numbers are read as floats, so e.g. 16000.50 is written as 16000.5 instead of keeping its digits.
+    With `use_pyarrow`, flat NDJSON files that fit in memory are converted by pyarrow's JSON reader and CSV writer.
+    This is faster, but pyarrow renders values its own way: strings are quoted, booleans are lowercase,
+    ISO dates are inferred as timestamps and floats lose trailing zeros.
     """
+    if schema_cls is not None and msgspec is None:
+        raise ImportError("schema_cls requires the msgspec package to be installed.")
+    if use_simdjson and simdjson is None:
+        raise ImportError("use_simdjson=True requires the pysimdjson package to be installed.")
+
     try:
         with open(json_file_path, 'r', encoding='utf-8') as json_file:
             first_char = json_file.read(1)
             json_file.seek(0)
 
             if first_char == '[':
-                logging.info(f"Detected JSON array format. Processing '{json_file_path}' with ijson...")
-                with open(json_file_path, 'rb') as json_file_binary:
-                    items = ijson.items(json_file_binary, 'item')
-                    _write_to_csv(items, csv_file_path)
+                if use_simdjson and _fits_in_memory(json_file_path):
+                    logging.info(f"Detected JSON array format. Processing '{json_file_path}' with simdjson...")
+                    converted = _simdjson_array_to_csv(json_file_path, csv_file_path)
+                else:
+                    converted = False
+
+                if not converted:
+                    logging.info(f"Detected JSON array format. Processing '{json_file_path}' with ijson...")
+                    with open(json_file_path, 'rb') as json_file_binary:
+                        items = ijson.items(json_file_binary, 'item')
+                        _write_to_csv(items, csv_file_path)
             else:
-                logging.info(f"Detected NDJSON/JSONL format. Processing '{json_file_path}' line by line...")
-                items = (json.loads(line, object_hook=decimal_object_hook) for line in json_file)
-                _write_to_csv(items, csv_file_path)
+                if use_pyarrow and schema_cls is None and _fits_in_memory(json_file_path):
+                    logging.info(f"Detected NDJSON/JSONL format. Processing '{json_file_path}' with pyarrow...")
+                    converted = _arrow_ndjson_to_csv(json_file_path, csv_file_path)
+                else:
+                    converted = False
+
+                if not converted:
+                    logging.info(f"Detected NDJSON/JSONL format. Processing '{json_file_path}' line by line...")
+                    items = _iter_ndjson(json_file, schema_cls)
+                    _write_to_csv(items, csv_file_path)
 
         logging.info(f"Successfully flattened {json_file_path} to {csv_file_path}")
 
@@ -60,24 +111,152 @@ def flatten_json_stream(json_file_path, csv_file_path):
     except Exception as e:
         logging.error(f"An error occurred during flattening: {e}", exc_info=True)
 
+def flatten_json_duckdb(json_file_path, csv_file_path):
+    """
+    Flattens a JSON or NDJSON file to a CSV file using DuckDB's native JSON reader and CSV writer.
+    Falls back to flatten_json_stream if DuckDB cannot read the document.
+    This is faster than flatten_json_stream, but DuckDB renders values its own way: booleans are
+    lowercase, floats lose trailing zeros (14000.00 -> 14000.0) and small floats use exponent form (1e-07).
+    """
+    logging.info(f"Flattening '{json_file_path}' to '{csv_file_path}' using DuckDB...")
+    try:
+        con = duckdb.connect(database=':memory:', read_only=False)
+        con.execute(
+            f"COPY (SELECT * FROM read_json_auto('{json_file_path}', format='auto')) "
+            f"TO '{csv_file_path}' (HEADER, DELIMITER ',')"
+        )
+        logging.info(f"Successfully flattened {json_file_path} to {csv_file_path}")
+    except duckdb.Error as e:
+        logging.warning(f"DuckDB could not flatten {json_file_path} ({e}). Falling back to streaming parser...")
+        flatten_json_stream(json_file_path, csv_file_path)
+    finally:
+        if 'con' in locals():
+            con.close()
+
+def _fits_in_memory(json_file_path):
+    """Checks whether the file can be parsed comfortably in RAM. Assumes it cannot when psutil is missing."""
+    if psutil is None:
+        return False
+    # Leave headroom for the parsed document alongside the raw buffer
+    return os.path.getsize(json_file_path) * 2 < psutil.virtual_memory().available
+
+def _arrow_ndjson_to_csv(json_file_path, csv_file_path):
+    """
+    Converts a flat NDJSON file to CSV with pyarrow's multithreaded JSON reader and C++ CSV writer.
+    Returns False if the file has nested values or pyarrow fails to read or write it,
+    in which case the caller rewrites the CSV file from scratch.
+    """
+    read_options = pa_json.ReadOptions(use_threads=True, block_size=1 << 20)
+    try:
+        table = pa_json.read_json(json_file_path, read_options=read_options)
+        if any(pa.types.is_nested(field.type) for field in table.schema):
+            logging.info("Nested values found, which pyarrow cannot write to CSV. Falling back to line-by-line parsing...")
+            return False
+
+        pa_csv.write_csv(table, csv_file_path)
+    except pa.ArrowException as e:
+        logging.warning(f"pyarrow could not convert {json_file_path} ({e}). Falling back to line-by-line parsing...")
+        return False
+
+    return True
+
+def _simdjson_array_to_csv(json_file_path, csv_file_path):
+    """
+    Converts a JSON array file to CSV after parsing it in one pass with simdjson.
+    Returns False without writing anything if simdjson cannot parse it (e.g. integers beyond 64 bits).
+    """
+    parser = simdjson.Parser()
+    try:
+        doc = parser.load(str(json_file_path))
+    except (ValueError, RuntimeError) as e:
+        logging.warning(f"simdjson could not parse {json_file_path} ({e}). Falling back to ijson...")
+        return False
+
+    # simdjson returns lazy proxies; materialize objects so _write_to_csv sees plain dicts
+    items = (element.as_dict() if isinstance(element, simdjson.Object) else element for element in doc)
+    _write_to_csv(items, csv_file_path)
+    return True
+
+def _iter_ndjson(json_file, schema_cls=None):
+    """
+    Yields the records of an NDJSON file; non-object lines are yielded unchanged for _write_to_csv to skip.
+    When schemaless, top-level float fields become Decimal(str(float)), so they are written exactly as
+    Python prints the float (1e5 -> 100000.0, 16000.50 -> 16000.5), while numbers nested in lists/objects
+    stay floats so those cells read as before (e.g. "[1.5, 2]").
+    """
+    if schema_cls is not None:
+        decoder = msgspec.json.Decoder(schema_cls)
+        for line in json_file:
+            yield msgspec.structs.asdict(decoder.decode(line))
+        return
+
+    if msgspec is not None:
+        decode = msgspec.json.Decoder(float_hook=_float_text_to_decimal).decode
+    else:
+        decode = lambda line: json.loads(line, parse_float=_float_text_to_decimal)
+
+    for line in json_file:
+        record = decode(line)
+        if isinstance(record, dict):
+            for key, value in record.items():
+                if isinstance(value, (list, dict)):
+                    record[key] = _decimals_to_floats(value)
+        yield record
+
+def _float_text_to_decimal(text):
+    """Converts a JSON float literal to Decimal via float, matching Decimal(str(value)) on a parsed float."""
+    return Decimal(str(float(text)))
+
+def _decimals_to_floats(value):
+    """Recursively converts Decimals inside nested lists/dicts back to floats."""
+    if isinstance(value, list):
+        return [_decimals_to_floats(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _decimals_to_floats(v) for k, v in value.items()}
+    if value.__class__ is Decimal:
+        return float(value)
+    return value
+
 def _write_to_csv(items, csv_file_path):
-    with open(csv_file_path, 'w', newline='', encoding='utf-8') as csv_file:
+    with open(csv_file_path, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as csv_file:
         writer = None
         header_written = False
 
         for i, item in enumerate(items):
             if not isinstance(item, dict):
-                logging.warning(f"Skipping item #{i} as it's not a dictionary: {item}")
+                logging.warning("Skipping item #%d as it's not a dictionary: %s", i, item)
                 continue
 
             if not header_written:
-                headers = item.keys()
-                writer = csv.DictWriter(csv_file, fieldnames=headers)
-                writer.writeheader()
+                headers = list(item.keys())
+                header_keys = set(headers)
+                dropped_keys = set()
+                get_values = _row_getter(headers)
+                writer = csv.writer(csv_file)
+                writer.writerow(headers)
                 header_written = True
-            
-            row = {k: str(v) if isinstance(v, Decimal) else v for k, v in item.items()}
-            writer.writerow(row)
+
+            # Fast path for rows with exactly the header's keys; otherwise missing keys become empty cells
+            if item.keys() == header_keys:
+                values = get_values(item)
+            else:
+                values = [item.get(h) for h in headers]
+                new_keys = item.keys() - header_keys - dropped_keys
+                if new_keys:
+                    logging.warning("Dropping keys not in the CSV header (from the first row), first seen in item #%d: %s",
+                                    i, sorted(new_keys, key=str))
+                    dropped_keys |= new_keys
+            writer.writerow(stringify_decimal_values(values))
+
+def _row_getter(headers):
+    """Returns a callable that extracts a row's values in header order as a tuple."""
+    if not headers:
+        return lambda item: ()
+    if len(headers) == 1:
+        # itemgetter returns a bare value rather than a 1-tuple for a single key
+        key = headers[0]
+        return lambda item: (item[key],)
+    return itemgetter(*headers)
 
 def infer_avro_schema_from_duckdb(con, table_name):
     """Infers a basic Avro schema from a DuckDB table description."""
@@ -120,19 +299,29 @@ def convert_ndjson_to_formats(ndjson_path, avro_path, parquet_path):
 
         logging.info(f"Writing to {avro_path}...")
         avro_schema = infer_avro_schema_from_duckdb(con, table_name)
+        decimal_columns = set()
         for field in avro_schema["fields"]:
             if isinstance(field["type"][1], dict) and field["type"][1].get("logicalType") == "decimal":
                 field["type"][1] = "string"
+                decimal_columns.add(field["name"])
         parsed_schema = parse_schema(avro_schema)
 
-        result = con.execute(f"SELECT * FROM {table_name}")
-        with open(avro_path, 'wb') as avro_file:
-            records = result.fetchdf().to_dict('records')
-            avro_records = [
-                {k: str(v) if isinstance(v, Decimal) else v for k, v in r.items()}
-                for r in records
-            ]
-            writer(avro_file, parsed_schema, avro_records)
+        # Cast DECIMAL columns to VARCHAR inside DuckDB so rows arrive with plain strings.
+        # read_json_auto infers JSON numbers as BIGINT/DOUBLE, so this only applies if a DECIMAL
+        # column is present in the table; for inferred NDJSON the select is a plain column list.
+        select_clause = ", ".join(
+            f'CAST("{name}" AS VARCHAR) AS "{name}"' if name in decimal_columns else f'"{name}"'
+            for name in (field["name"] for field in avro_schema["fields"])
+        )
+        # Stream record batches so only one batch is materialized as Python dicts at a time
+        reader = con.execute(f"SELECT {select_clause} FROM {table_name}").fetch_record_batch(rows_per_batch=10000)
+
+        def avro_records():
+            for batch in reader:
+                yield from batch.to_pylist()
+
+        with open(avro_path, 'wb', buffering=WRITE_BUFFER_SIZE) as avro_file:
+            writer(avro_file, parsed_schema, avro_records())
 
         logging.info(f"Successfully converted to {avro_path} and {parquet_path}")
 
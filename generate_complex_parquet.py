@@ -39,32 +39,36 @@ def generate_complex_parquet(output_path: str):
         ]))
     ])
 
-    # 2. Create sample data that conforms to the schema
-    data = [
-        {
-            'id': 1,
-            'simple_array': ['tag1', 'tag2'],
-            'array_of_arrays': [[1, 2], [3, 4, 5]],
-            'array_of_structs': [{'x': 10, 'y': 20}, {'x': 15, 'y': 25}],
-            'struct_of_arrays': {
+    # 2. Create sample data that conforms to the schema, laid out column by column
+    # so that pyarrow can build each column in a single pass.
+    data = {
+        'id': [1, 2],
+        'simple_array': [
+            ['tag1', 'tag2'],
+            None,  # Example of a null list
+        ],
+        'array_of_arrays': [
+            [[1, 2], [3, 4, 5]],
+            [[10], [20, 30], []],
+        ],
+        'array_of_structs': [
+            [{'x': 10, 'y': 20}, {'x': 15, 'y': 25}],
+            [],  # Example of an empty list of structs
+        ],
+        'struct_of_arrays': [
+            {
                 'timestamps': [datetime(2023, 1, 1, 12, 0), datetime(2023, 1, 1, 13, 0)],
                 'values': [100.5, 102.3]
-            }
-        },
-        {
-            'id': 2,
-            'simple_array': None,  # Example of a null list
-            'array_of_arrays': [[10], [20, 30], []],
-            'array_of_structs': [],  # Example of an empty list of structs
-            'struct_of_arrays': {
+            },
+            {
                 'timestamps': [], # Example of empty lists within a struct
                 'values': []
-            }
-        }
-    ]
+            },
+        ],
+    }
 
-    # 3. Convert the Python dictionary data to a PyArrow Table
-    table = pa.Table.from_pylist(data, schema=schema)
+    # 3. Convert the columnar Python data to a PyArrow Table
+    table = pa.Table.from_pydict(data, schema=schema)
 
     # 4. Write the PyArrow Table to a Parquet file
     print(f"Writing complex Parquet file to: {output_path}")
@@ -24,16 +24,29 @@ def remove_empty_columns_duckdb(input_path: str, output_path: str):
         # Connect to an in-memory DuckDB database
         con = duckdb.connect(database=":memory:", read_only=False)
 
-        # 1. Use SUMMARIZE to get column statistics in a single pass.
-        # The 'null_percentage' column in the summary represents the percentage of non-null values.
+        # 1. Get the column names without scanning the data.
         # read_csv_auto is used to automatically detect CSV parameters.
-        summary_df = con.execute(
-            f"SUMMARIZE SELECT * FROM read_csv_auto('{input_path}')"
-        ).fetchdf()
+        all_columns = [
+            row[0] for row in con.execute(
+                f"DESCRIBE SELECT * FROM read_csv_auto('{input_path}') LIMIT 0"
+            ).fetchall()
+        ]
 
-        # 2. Identify columns where the count of non-null values is 0
-        all_columns = summary_df["column_name"].tolist()
-        empty_cols = summary_df[summary_df["null_percentage"] == 100]["column_name"].tolist()
+        # 2. Count the non-null values of every column in a single scan.
+        # This only computes what is needed, unlike SUMMARIZE which also computes
+        # min/max, distinct counts and quantiles for each column.
+        count_clause = ", ".join([f'COUNT("{col}")' for col in all_columns])
+        *non_null_counts, total_rows = con.execute(
+            f"SELECT {count_clause}, COUNT(*) FROM read_csv_auto('{input_path}')"
+        ).fetchone()
+
+        # Identify columns where the count of non-null values is 0
+        empty_cols = [
+            col for col, count in zip(all_columns, non_null_counts)
+            if total_rows and count == 0
+        ]
+        # Set for constant-time membership checks on wide files
+        empty_set = set(empty_cols)
 
         if not empty_cols:
             print("\nNo completely empty columns found. File is already clean.")
@@ -42,7 +55,7 @@ def remove_empty_columns_duckdb(input_path: str, output_path: str):
         print(f"\nFound completely empty columns to remove: {empty_cols}")
 
         # 3. Construct a SELECT statement with only the columns to keep
-        cols_to_keep = [col for col in all_columns if col not in empty_cols]
+        cols_to_keep = [col for col in all_columns if col not in empty_set]
         select_clause = ", ".join([f'"{col}"' for col in cols_to_keep])
 
         # 4. Use the COPY command to stream the result to a new CSV file
@@ -0,0 +1,10 @@
+# Only builds the optional Cython extension used by flatten_json.py; this is not a package setup script:
+#   pip install cython
+#   python setup_fast_rowtransform.py build_ext --inplace
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name='_fast_rowtransform',
+    ext_modules=cythonize('_fast_rowtransform.pyx', language_level=3),
+)